@@ -32,7 +32,12 @@ def organize_single_folder(folder_path):
             continue
         item_path = os.path.join(folder_path, item)
         if item != "Single Issues":
-            shutil.move(item_path, os.path.join(single_issues_folder, item))
+            destination_path = os.path.join(single_issues_folder, item)
+            # A plain rename is a single syscall on the same filesystem, shutil.move is only needed to copy across filesystems
+            try:
+                os.replace(item_path, destination_path)
+            except OSError:
+                shutil.move(item_path, destination_path)
             print(f"Moved {item} to {single_issues_folder}")
 
 if __name__ == "__main__":
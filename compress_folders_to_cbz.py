@@ -1,7 +1,11 @@
 import os
+import threading
 import zipfile
 import sys
 
+# One reusable 1MB copy buffer per thread for writing files into the cbz
+io_buffers = threading.local()
+
 def compress_folders_to_cbz(base_folder_path):
     # Check if the given path is a directory
     if not os.path.isdir(base_folder_path):
@@ -18,13 +22,36 @@ def compress_folders_to_cbz(base_folder_path):
             print(f"Compressing folder: {folder_path} to {cbz_file_path}")
             compress_folder_to_cbz(folder_path, cbz_file_path)
 
+def get_io_buffer():
+    buffer = getattr(io_buffers, 'buffer', None)
+    if buffer is None:
+        buffer = io_buffers.buffer = bytearray(1 << 20)
+    return buffer
+
+def write_file_to_zip(zip_ref, file_path, arcname):
+    # ZipFile.write allocates fresh read buffers for every file, this reads into the same one each time
+    buffer = get_io_buffer()
+    view = memoryview(buffer)
+
+    zip_info = zipfile.ZipInfo.from_file(file_path, arcname)
+    # Images are stored as cbz readers expect, text metadata such as ComicInfo.xml compresses well so it is deflated
+    zip_info.compress_type = zipfile.ZIP_DEFLATED if arcname.lower().endswith('.xml') else zip_ref.compression
+
+    with open(file_path, 'rb', buffering=0) as source, zip_ref.open(zip_info, 'w') as destination:
+        while (size := source.readinto(buffer)):
+            destination.write(view[:size])
+
 def compress_folder_to_cbz(folder_path, cbz_file_path):
-    with zipfile.ZipFile(cbz_file_path, 'w') as cbz_file:
+    # Store the images as is, they are already compressed so deflating them only costs CPU
+    # The 1MB write buffer coalesces zipfile's small header and data writes
+    # Every walked path starts with the folder path, so the archive name is a slice rather than a relpath call
+    folder_prefix_length = len(os.path.join(folder_path, ''))
+    with open(cbz_file_path, 'wb', buffering=1 << 20) as output_file, zipfile.ZipFile(output_file, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as cbz_file:
         for root, dirs, files in os.walk(folder_path):
             for file in files:
                 file_path = os.path.join(root, file)
-                arcname = os.path.relpath(file_path, folder_path)
-                cbz_file.write(file_path, arcname)
+                arcname = file_path[folder_prefix_length:]
+                write_file_to_zip(cbz_file, file_path, arcname)
 
 if __name__ == "__main__":
     if len(sys.argv) != 2:
@@ -1,17 +1,71 @@
 import argparse
+import contextlib
+import functools
+import io
+import itertools
+import mmap
 import os
 import shutil
 import zipfile
 import rarfile
 import py7zr
 import tempfile
-from PIL import Image
-import math as Math
-from concurrent.futures import ThreadPoolExecutor
+import threading
+import queue
+import PIL
+from PIL import Image, features
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 import time
 
-# Define the executor globally if the conversion tasks will be frequently called
-executor = ThreadPoolExecutor(max_workers=4)
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# libarchive-c is used for 7z extraction when it is installed, falling back to py7zr
+try:
+    import libarchive
+except ImportError:
+    libarchive = None
+
+# simplejpeg wraps libjpeg-turbo and releases the GIL while decoding and encoding, PIL is used when it isn't installed
+try:
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
+# zlib-ng deflates the xml metadata of the output cbz files several times faster than the system zlib, with the same output format
+try:
+    from zlib_ng import zlib_ng
+    zipfile.zlib = zlib_ng
+except ImportError:
+    zlib_ng = None
+
+# libvips converts webp pages in a streaming pipeline with a much smaller working set than PIL, PIL is used when it isn't installed
+try:
+    import pyvips
+except ImportError:
+    pyvips = None
+
+# extension sets are checked with a single hash lookup on the lowercased extension
+COMIC_BOOK_EXTENSIONS = frozenset(('.cbz', '.cbr', '.zip', '.rar', '.cb7', '.7z'))
+IMAGE_EXTENSIONS = frozenset(('.png', '.jpg', '.jpeg', '.bmp', '.gif'))
+JPEG_EXTENSIONS = frozenset(('.jpg', '.jpeg'))
+PNG_CONVERSION_EXTENSIONS = frozenset(('.jpg', '.jpeg', '.bmp', '.gif', '.webp'))
+JPG_CONVERSION_EXTENSIONS = frozenset(('.png', '.bmp', '.gif', '.webp'))
+CONVERSION_SOURCE_EXTENSIONS = {'webp': IMAGE_EXTENSIONS, 'png': PNG_CONVERSION_EXTENSIONS, 'jpg': JPG_CONVERSION_EXTENSIONS}
+
+# how many converted comics pass between progress messages
+PROGRESS_INTERVAL = 10
+
+# marks the end of the entries queued for the zip writer thread
+WRITER_SENTINEL = object()
+
+# one reusable 1MB copy buffer per thread for writing files into archives
+io_buffers = threading.local()
+
+# Pillow-SIMD releases carry a '.postN' suffix on top of the Pillow version they track
+PILLOW_SIMD = '.post' in PIL.__version__
 
 def parse_arguments():
     parser = argparse.ArgumentParser()
@@ -28,7 +82,14 @@ def parse_arguments():
     parser.add_argument('--convert-image-file-type', action='store', help='Set the image type used for the images in comic book files', default='webp')
 
     parser.add_argument('-c', '--compress', action='store_true', help='Compress the comic book files')
-    parser.add_argument('--compress-rate', action='store', help='Set the image compression rate for compressing comic book files', default=90)
+    parser.add_argument('--compress-rate', action='store', type=int, help='Set the image compression rate for compressing comic book files', default=90)
+
+    parser.add_argument('-j', '--jobs', action='store', type=int, help='Number of comic book files to convert at the same time, defaults to the number of cpu cores', default=None)
+
+    parser.add_argument('--fast-resize', action='store_true', help='Halve oversized images by dropping every other pixel instead of filtering, faster but lower quality')
+
+    # libwebp's method, 0 is the fastest and 6 gives the smallest files
+    parser.add_argument('--webp-effort', action='store', type=int, choices=range(7), help='Set the webp encoder effort from 0 (fastest) to 6 (smallest files)', default=4)
 
     parser.add_argument('--comicinfo', action='store_true', help='Add an empty comicinfo.xml file to hold comicbook metadata')
 
@@ -62,32 +123,104 @@ def check_if_input_is_file_or_directory(input):
     else:
         return None
     
+def get_file_extension(file):
+    return os.path.splitext(file)[1].lower()
+
 def check_if_file_is_comic_book_file(file):
-    return file.lower().endswith(('.cbz', '.cbr', '.zip', '.rar', '.cb7', '.7z')) and not file[0] == '.'
+    return get_file_extension(file) in COMIC_BOOK_EXTENSIONS and not os.path.basename(file)[0] == '.'
+
+def check_if_file_is_image_file(file):
+    return get_file_extension(file) in IMAGE_EXTENSIONS and not os.path.basename(file)[0] == '.'
+
+def check_if_file_needs_conversion(file, convert_image_file_type):
+    if convert_image_file_type not in CONVERSION_SOURCE_EXTENSIONS:
+        return False
+    return get_file_extension(file) in CONVERSION_SOURCE_EXTENSIONS[convert_image_file_type] and not os.path.basename(file)[0] == '.'
 
 def create_temp_directory(directory):
     temp_dir = tempfile.mkdtemp(dir=directory)
     return temp_dir
 
-def determine_compression_type(file_path):
-    signatures = {
-        "ZIP": b"PK",
-        "RAR": b"Rar!\x1A\x07\x00",
-        "7Z": b"7z\xBC\xAF\x27\x1C"
-    }
+'''
+    opens a file that will be read once from start to end
+    the kernel is told to read ahead aggressively, which cuts i/o wait on cold caches
 
-    with open(file_path, 'rb') as file:
-        file_header = file.read(8)  # Read the first 8 bytes for checking
+    returns the file opened for reading with a 1MB buffer
+'''
+def open_file_for_sequential_read(file_path):
+    file = open(file_path, 'rb', buffering=1 << 20)
+    if hasattr(os, 'posix_fadvise'):
+        os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+    return file
 
-    for compression_type, signature in signatures.items():
-        if file_header.startswith(signature):
-            return compression_type
+'''
+    tells the kernel the cached pages of a file won't be needed again, so a run over hundreds of comics
+    doesn't push more useful pages out of the page cache
+'''
+def release_page_cache(file):
+    if hasattr(os, 'posix_fadvise'):
+        file.flush()
+        os.posix_fadvise(file.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
 
-    return "Unknown"
+'''
+    a read only memory map ZipFile can read from, ZipFile asks its file whether it is seekable
+    and mmap only answers that itself from python 3.13 on
+'''
+class ArchiveMap(mmap.mmap):
+    def seekable(self):
+        return True
+
+'''
+    builds the path an archive entry is extracted to, dropping empty, '.' and '..' components the same way ZipFile.extract does
+'''
+def get_entry_output_path(name, output):
+    parts = [part for part in name.split('/') if part not in ('', os.path.curdir, os.path.pardir)]
+    return os.path.join(output, *parts)
+
+'''
+    extracts the entries of a zip file from several threads at once
+    ZipFile keeps a single file offset, so each worker maps the archive itself and extracts its share of the entries
+
+    file: the path or opened file object of the zip/cbz file to extract
+    output: the directory to extract the file into
+    workers: the number of extraction threads, defaults to the cpu count
+'''
+def parallel_extract_zip(file, output, workers=None):
+    workers = workers or os.cpu_count() or 4
+    # the workers need their own handles, so they open the archive by name
+    file_path = getattr(file, 'name', file)
+
+    with zipfile.ZipFile(file, 'r') as zip_ref:
+        infos = [info for info in zip_ref.infolist() if not info.is_dir()]
+
+    # every worker maps and parses the archive, so a comic with fewer entries than cores only gets a worker per entry
+    workers = min(workers, len(infos))
+    if workers == 0:
+        return
+
+    # create every directory up front so the workers never race on makedirs
+    directories = {output}
+    for info in infos:
+        directories.add(os.path.dirname(get_entry_output_path(info.filename, output)))
+    for directory in directories:
+        os.makedirs(directory, exist_ok=True)
+
+    def extract_entries(entries):
+        # the archive is mapped into memory, so entries are read from the page cache without a copy through a file buffer
+        with open(file_path, 'rb') as source_file, ArchiveMap(source_file.fileno(), 0, access=mmap.ACCESS_READ) as source_map, zipfile.ZipFile(source_map, 'r') as zip_ref:
+            for info in entries:
+                with zip_ref.open(info) as source, open(get_entry_output_path(info.filename, output), 'wb') as target:
+                    shutil.copyfileobj(source, target, length=1 << 20)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(extract_entries, infos[index::workers]) for index in range(workers)]
+        for future in as_completed(futures):
+            future.result()
 
 '''
     decompresses a zip/cbz file into a directory, which is the output parameter
-    file: the zip/cbz file to decompress
+    file: the path or opened file object of the zip/cbz file to decompress
     output: the directory to decompress the file into
 
     returns True if the file was successfully uncompressed, False otherwise
@@ -95,8 +228,7 @@ def determine_compression_type(file_path):
 def decompress_zip_file(file, output):
 
     try:
-        with zipfile.ZipFile(file, 'r') as zip_ref:
-            zip_ref.extractall(output)
+        parallel_extract_zip(file, output)
         return True
     except Exception as e:
         print(f'Error: Failed to decompress ZIP file {file}')
@@ -105,14 +237,15 @@ def decompress_zip_file(file, output):
     
 '''
     decompress a rar/cbr file into a directory, which is the output parameter
-    file: the rar/cbr file to decompress
+    file: the path or opened file object of the rar/cbr file to decompress
     output: the directory to decompress the file into
 
     returns True if the file was successfully uncompressed, False otherwise
 '''
 def decompress_rar_file(file, output):
     try:
-        with rarfile.RarFile(file, 'r') as rar_ref:
+        # rarfile copies an archive passed as a file object to a temp file for every solid entry, so it is opened by name
+        with rarfile.RarFile(getattr(file, 'name', file), 'r') as rar_ref:
             rar_ref.extractall(output)
         return True
     except Exception as e:
@@ -120,17 +253,40 @@ def decompress_rar_file(file, output):
         print(e)
         return False
     
+'''
+    extracts an archive with libarchive, which decodes LZMA/LZMA2 in C without py7zr's per-block python overhead
+    file: the path of the archive to extract
+    output: the directory to extract the archive into
+'''
+def extract_archive_with_libarchive(file, output):
+    with libarchive.file_reader(file) as archive:
+        for entry in archive:
+            if not entry.isfile:
+                continue
+
+            entry_path = get_entry_output_path(entry.pathname, output)
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            with open(entry_path, 'wb') as target:
+                for block in entry.get_blocks():
+                    target.write(block)
+
 '''
     decompress a 7z/cb7 file into a directory, which is the output parameter
-    file: the 7z/cb7 file to decompress
+    file: the path or opened file object of the 7z/cb7 file to decompress
     output: the directory to decompress the file into
 
     returns True if the file was successfully uncompressed, False otherwise
 '''
 def decompress_7z_file(file, output):
+    # both extractors open the archive by name, py7zr only decodes folders on several threads when it owns the file
+    file_path = getattr(file, 'name', file)
+
     try:
-        with py7zr.SevenZipFile(file, mode='r') as archive:
-            archive.extractall(output)
+        if libarchive is not None:
+            extract_archive_with_libarchive(file_path, output)
+        else:
+            with py7zr.SevenZipFile(file_path, mode='r') as archive:
+                archive.extractall(output)
         return True
     except Exception as e:
         print(f'Error: Failed to decompress 7z file {file}')
@@ -138,130 +294,478 @@ def decompress_7z_file(file, output):
         return False
     
 
+'''
+    the archive classes tried by open_archive, in order, with the type name and the error each raises for a file it can't read
+    zip is tried first since it covers most comics and reading its central directory is cheap
+'''
+ARCHIVE_OPENERS = (
+    ('ZIP', zipfile.ZipFile, zipfile.BadZipFile),
+    ('RAR', rarfile.RarFile, rarfile.Error),
+    ('7Z', py7zr.SevenZipFile, py7zr.Bad7zFile),
+)
+
+'''
+    an opened comic book archive, giving zip, rar and 7z files the same interface
+    compression_type: ZIP, RAR or 7Z
+    archive: the opened ZipFile, RarFile or SevenZipFile
+    file: the underlying file the archive was read from
+'''
+class ComicArchive:
+    def __init__(self, compression_type, archive, file):
+        self.compression_type = compression_type
+        self.archive = archive
+        self.file = file
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.archive.close()
+        self.file.close()
+
+    '''
+        whether the entries of the archive can be read one after another without decoding anything twice
+        zip and non solid rar entries are read directly, 7z and solid rar archives need libarchive to be read in a single pass
+    '''
+    def can_stream(self):
+        if self.compression_type == 'ZIP':
+            return True
+        if self.compression_type == 'RAR' and not self.archive.is_solid():
+            return True
+        return libarchive is not None
+
+    '''
+        reads the file entries of the archive in archive order, directories are skipped
+
+        yields the ZipInfo the entry is written to a cbz file with and the bytes of the entry
+    '''
+    def iter_entry_data(self):
+        if self.compression_type == 'ZIP':
+            for info in self.archive.infolist():
+                if not info.is_dir():
+                    yield copy_zip_info(info), self.archive.read(info)
+        elif self.compression_type == 'RAR' and not self.archive.is_solid():
+            for info in self.archive.infolist():
+                if not info.is_dir():
+                    yield create_zip_info(info.filename, info.date_time), self.archive.read(info)
+        else:
+            # libarchive decodes solid blocks once, front to back, instead of restarting the block for every entry
+            with libarchive.file_reader(self.file.name) as archive:
+                for entry in archive:
+                    if entry.isfile:
+                        date_time = time.localtime(entry.mtime)[:6] if entry.mtime else None
+                        yield create_zip_info(entry.pathname, date_time), b''.join(entry.get_blocks())
+
+    '''
+        extracts every entry of the archive into the output directory
+
+        returns True if the archive was successfully extracted, False otherwise
+    '''
+    def extract_all(self, output):
+        if self.compression_type == 'ZIP':
+            self.file.seek(0)
+            return decompress_zip_file(self.file, output)
+        elif self.compression_type == 'RAR':
+            return decompress_rar_file(self.file.name, output)
+        return decompress_7z_file(self.file.name, output)
+
+'''
+    opens an archive without sniffing its header first, each archive class is tried on the file until one accepts it
+    file_path: the archive to open
+
+    returns a ComicArchive, or None if the file isn't a zip, rar or 7z archive
+'''
+def open_archive(file_path):
+    file = open_file_for_sequential_read(file_path)
+
+    for compression_type, archive_class, archive_error in ARCHIVE_OPENERS:
+        file.seek(0)
+        try:
+            # rarfile copies a file object to a temp file per solid entry and py7zr stops extracting on several threads, so they get the path
+            return ComicArchive(compression_type, archive_class(file if compression_type == 'ZIP' else file_path, 'r'), file)
+        except archive_error:
+            continue
+
+    file.close()
+    return None
+
+'''
+    converts an image to a mode the webp encoder takes directly
+    image: the PIL image
+
+    returns the image in RGB or RGBA mode, which is the image itself when it already was
+'''
+def convert_image_to_webp_mode(image):
+    # jpeg pages are usually RGB already and webp keeps alpha, converting them would only copy every pixel
+    if image.mode in ('RGB', 'RGBA'):
+        return image
+
+    # images with transparency keep it, webp stores the alpha channel
+    if 'A' in image.getbands() or 'transparency' in image.info:
+        return image.convert('RGBA')
+
+    return image.convert("RGB")  # Convert the image to RGB mode
+
+'''
+    prepares an opened image for webp encoding, converting it to RGB or RGBA and halving images larger than 3500px
+    image: the opened PIL image
+    fast_resize: halve the image by nearest neighbour decimation instead of filtering
+
+    returns the prepared image
+'''
+def prepare_image_for_webp(image, fast_resize=False):
+    oversized = image.width > 3500 or image.height > 3500
+    half_size = (image.width // 2, image.height // 2)
+
+    if oversized and not fast_resize and image.format == 'JPEG':
+        # jpegs are decoded straight at half size by libjpeg's DCT scaling instead of decoding every pixel and throwing 3/4 away
+        image.draft('RGB', half_size)
+
+    # convert before resizing so palette and CMYK images are resampled in their final mode
+    image = convert_image_to_webp_mode(image)
+
+    # resize the image to half its size
+    if oversized and fast_resize and numpy is not None:
+        # nearest neighbour decimation, the strided copy runs inside numpy without holding the GIL
+        image = Image.fromarray(numpy.asarray(image)[::2, ::2].copy())
+    elif oversized and fast_resize:
+        image = image.resize(half_size, Image.NEAREST)
+    elif oversized:
+        # thumbnail resizes in place, and with a reducing gap of 1 the 2:1 step is done by Image.reduce's
+        # box reduction so lanczos only touches what the draft and the reduction leave over
+        image.thumbnail(half_size, Image.LANCZOS, reducing_gap=1.0)
+
+    return image
+
 '''
     converts an image file to a webp file, image file can be a .png, .jpg, .jpeg, .bmp, or .gif file
     imagePath: the path to the image file to convert
 
-    returns True if the image was successfully converted and original file was deleted, False otherwise
+    returns the path of the image that is kept, the webp file if it was smaller and the original otherwise, or None if the conversion failed
 '''
-def convert_image_to_webp(image_path, compress_quality=100):
+def convert_image_to_webp(image_path, compress_quality=100, fast_resize=False, webp_effort=4):
     try:
-        # Open the image file
-        with Image.open(image_path) as image:
-            size_of_original = os.path.getsize(image_path)
-            # resize the image to half its size
-            if image.width > 3500 or image.height > 3500:
-                image = image.resize((int(image.width/2), int(image.height/2)), Image.LANCZOS)
+        # Open the image file, its size comes from the open handle instead of a separate stat of the path
+        with open(image_path, 'rb') as image_file, Image.open(image_file) as image:
+            size_of_original = os.fstat(image_file.fileno()).st_size
+
+            # Convert the image to webp format in memory
+            image = prepare_image_for_webp(image, fast_resize)
+            buffer = io.BytesIO()
+            image.save(buffer, 'webp', quality=compress_quality, method=webp_effort, optimize=True, lossless=False)
+
+        # Only write the webp file and delete the original image file if the webp file is smaller
+        if buffer.tell() < size_of_original:
+            webp_path = os.path.splitext(image_path)[0] + '.webp'
+            with open(webp_path, 'wb') as webp_file:
+                webp_file.write(buffer.getbuffer())
+            os.remove(image_path)
+            return webp_path
+
+        return image_path
+    except Exception as e:
+        print(f'Error: Failed to convert webp image {image_path}')
+        print(e)
+        return None
 
-            # Convert the image to webp format
-            webp_path = image_path.replace(image_path.split('.')[-1], 'webp')
-            image = image.convert("RGB")  # Convert the image to RGB mode
-            image.save(webp_path, 'webp', quality=compress_quality, optimize=True, lossless=False)
+'''
+    converts an image file to a webp file with libvips, image file can be a .png, .jpg, .jpeg, .bmp, or .gif file
+    the image is read sequentially, so libvips only holds the strips of pixels it is currently encoding
+    images libvips can't open, such as bmp files without imagemagick support, fall back to convert_image_to_webp
+    image_path: the path to the image file to convert
 
-            size_of_webp = os.path.getsize(webp_path)
-        
-            # Delete the original image file if the webp file is smaller
-            if size_of_webp < size_of_original:
-                os.remove(image_path)
-            else:
-                os.remove(webp_path)
+    returns the path of the image that is kept, the webp file if it was smaller and the original otherwise, or None if the conversion failed
+'''
+def convert_image_to_webp_vips(image_path, compress_quality=100, fast_resize=False, webp_effort=4):
+    try:
+        image = pyvips.Image.new_from_file(image_path, access='sequential')
+    except pyvips.Error:
+        # libvips only reads formats such as bmp through imagemagick, images it can't open are converted with PIL
+        return convert_image_to_webp(image_path, compress_quality, fast_resize, webp_effort)
+
+    try:
+        size_of_original = os.path.getsize(image_path)
+
+        # resize the image to half its size
+        if image.width > 3500 or image.height > 3500:
+            image = image.resize(0.5, kernel='nearest' if fast_resize else 'lanczos3')
+
+        # encode in memory so only a webp smaller than the original is ever written
+        webp_data = image.webpsave_buffer(Q=compress_quality, effort=webp_effort, smart_subsample=True)
+
+        # Only write the webp file and delete the original image file if the webp file is smaller
+        if len(webp_data) < size_of_original:
+            webp_path = os.path.splitext(image_path)[0] + '.webp'
+            with open(webp_path, 'wb') as webp_file:
+                webp_file.write(webp_data)
+            os.remove(image_path)
+            return webp_path
+
+        return image_path
     except Exception as e:
         print(f'Error: Failed to convert webp image {image_path}')
         print(e)
-        return False
+        return None
+
+# the webp converter used for extracted images, picked once at import time
+WEBP_CONVERTER = convert_image_to_webp_vips if pyvips is not None else convert_image_to_webp
+
+'''
+    decodes image data into a PIL image, using libjpeg-turbo through simplejpeg for jpegs when it is available
+    data: the bytes of the image
+    name: the name of the image, used to pick the decoder
+    draft_oversized: leave jpegs larger than 3500px undecoded so prepare_image_for_webp can draft them at half size
+
+    returns the decoded image
+'''
+def decode_image_bytes(data, name, draft_oversized=False):
+    if simplejpeg is not None and get_file_extension(name) in JPEG_EXTENSIONS and simplejpeg.is_jpeg(data):
+        try:
+            height, width, colorspace = simplejpeg.decode_jpeg_header(data)[:3]
+            # simplejpeg decodes every pixel, PIL's draft only decodes the quarter that survives the halving
+            if not (draft_oversized and (width > 3500 or height > 3500)):
+                # grayscale scans stay single channel, the same L mode PIL decodes them to
+                if colorspace == 'Gray':
+                    return Image.fromarray(simplejpeg.decode_jpeg(data, colorspace='GRAY')[:, :, 0])
+                # CMYK and YCCK jpegs are left to PIL
+                if colorspace in ('YCbCr', 'RGB'):
+                    return Image.fromarray(simplejpeg.decode_jpeg(data, colorspace='RGB'))
+        except ValueError:
+            pass  # let PIL have a go at jpegs libjpeg-turbo rejects
+
+    return Image.open(io.BytesIO(data))
+
+'''
+    converts image data to webp in memory
+    data: the bytes of a .png, .jpg, .jpeg, .bmp, or .gif image
+    name: the name of the image, used for error messages
+
+    returns the webp bytes, or None if the image could not be converted
+'''
+def convert_image_data_to_webp(data, name, compress_quality=100, fast_resize=False, webp_effort=4):
+    try:
+        with decode_image_bytes(data, name, not fast_resize) as image:
+            image = prepare_image_for_webp(image, fast_resize)
+            buffer = io.BytesIO()
+            image.save(buffer, 'webp', quality=compress_quality, method=webp_effort, optimize=True, lossless=False)
+        return buffer.getvalue()
+    except Exception as e:
+        print(f'Error: Failed to convert webp image {name}')
+        print(e)
+        return None
     
+'''
+    encodes an image as png
+    image: the PIL image
+
+    returns the png bytes
+'''
+def encode_image_as_png(image):
+    buffer = io.BytesIO()
+    # zlib level 1 is several times faster than the default of 6 for a few percent in size
+    image.save(buffer, 'PNG', compress_level=1)
+    return buffer.getvalue()
+
+'''
+    encodes an image as jpg, using libjpeg-turbo through simplejpeg when it is available
+    image: the PIL image
+
+    returns the jpg bytes
+'''
+def encode_image_as_jpg(image):
+    # Convert the image to RGB if it's not already in a compatible format
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGB')
+
+    if simplejpeg is not None:
+        return simplejpeg.encode_jpeg(numpy.asarray(image), quality=85, colorspace=image.mode, colorsubsampling='420')
+
+    buffer = io.BytesIO()
+    # 4:2:0 chroma subsampling without the optimize and progressive passes keeps encoding fast
+    image.save(buffer, 'jpeg', quality=85, optimize=False, progressive=False, subsampling=2)
+    return buffer.getvalue()
+
 '''
     converts an image file to a png file, image file can be a .jpg, .jpeg, .bmp, or .gif file
     imagePath: the path to the image file to convert
 
-    returns True if the image was successfully converted, False otherwise
+    returns the path of the png file, or None if the image could not be converted
 '''
 def convert_image_to_png(image_path):
     try:
+        # the png path comes from the file extension, so it is known without reading the image format
+        png_path = os.path.splitext(image_path)[0] + '.png'
+
         # Open the image file
         with Image.open(image_path) as image:
             # Convert the image to png format
-            png_path = image_path.replace(image.format.lower(), 'png')
-            image.save(png_path, 'png')
+            png_data = encode_image_as_png(image)
+
+        with open(png_path, 'wb') as png_file:
+            png_file.write(png_data)
+
+        # the png replaces the original, the same as the streamed conversion does inside the archive
+        os.remove(image_path)
         
-        return True
+        return png_path
     except Exception as e:
         print(f'Error: Failed to convert PNG image {image_path}')
         print(e)
-        return False
+        return None
     
 '''
     converts an image file to a jpg file, image file can be a .png, .bmp, or .gif file
     imagePath: the path to the image file to convert
 
-    returns True if the image was successfully converted, False otherwise
+    returns the path of the jpg file, or None if the image could not be converted
 '''
 def convert_image_to_jpg(image_path):
     try:
         # Open the image file
         with Image.open(image_path) as image:
-            # Convert the image to RGB if it's not already in a compatible format
-            if image.mode not in ('RGB', 'RGBA'):
-                image = image.convert('RGB')
-
             # Convert the image to jpg format
-            jpg_path = image_path.replace(image_path.split('.')[-1], 'jpeg')
-            image.save(jpg_path, 'jpeg', quality=1)
+            jpg_path = os.path.splitext(image_path)[0] + '.jpeg'
+            jpg_data = encode_image_as_jpg(image)
+
+        with open(jpg_path, 'wb') as jpg_file:
+            jpg_file.write(jpg_data)
             
         os.remove(image_path)
         
-        return True
+        return jpg_path
     except Exception as e:
         print(f'Error: Failed to convert JPG image {image_path}')
         print(e)
-        return False
+        return None
     
 
-def traverse_directory_for_image_webp_conversion(directory, compress, compress_rate):
-    futures = []
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.lower().endswith(('.png', '.jpg', '.jpeg', '.bmp', '.gif')) and not file[0] == '.':
-                image_path = os.path.join(root, file)
-                if compress:
-                    #convertImageToWebp(image_path, compressRate)
-                    future = executor.submit(convert_image_to_webp, image_path, compress_rate)
-                    futures.append(future)
-                else:
-                    #convertImageToWebp(image_path)
-                    future = executor.submit(convert_image_to_webp, image_path)
-                    futures.append(future)
-
-    for future in futures:
-        future.result()
-
-def traverse_directory_for_image_png_conversion(directory, compress, compress_rate):
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.lower().endswith(('.jpg', '.jpeg', '.bmp', '.gif', '.webp')):
-                image_path = os.path.join(root, file)
-                convert_image_to_png(image_path)
+'''
+    converts every image in a directory to webp, spreading the work over a process per cpu core
+    images are submitted in batches so a failing conversion surfaces before the whole directory is queued
+    parallel: set to False when the caller is already running one comic per process, to avoid oversubscribing the cpu
+    files: the files of the directory from list_tree, the directory is listed when they aren't passed in
 
-def traverse_directory_for_image_jpg_conversion(directory, compress, compress_rate):
-    for root, dirs, files in os.walk(directory):
-        for file in files:
-            if file.lower().endswith(('.png', '.bmp', '.gif', '.webp')):
-                image_path = os.path.join(root, file)
-                convert_image_to_jpg(image_path)
+    returns the files of the directory after the conversion, with converted images under their new path
+'''
+def traverse_directory_for_image_webp_conversion(directory, compress, compress_rate, parallel=True, fast_resize=False, webp_effort=4, files=None):
+    if files is None:
+        files = list_tree(directory)
+
+    image_paths = [file for file in files if check_if_file_is_image_file(file)]
+
+    compress_quality = compress_rate if compress else 100
+
+    if not parallel:
+        kept_paths = [WEBP_CONVERTER(image_path, compress_quality, fast_resize, webp_effort) for image_path in image_paths]
+    else:
+        # the pool is created per call rather than at import so worker processes are only forked when needed
+        max_workers = os.cpu_count() or 4
+        batch_size = max_workers * 4
+        kept_paths = []
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            for index in range(0, len(image_paths), batch_size):
+                batch = image_paths[index:index + batch_size]
+                # map returns results in submission order, so the pages keep the order they were listed in
+                kept_paths.extend(executor.map(WEBP_CONVERTER, batch, itertools.repeat(compress_quality), itertools.repeat(fast_resize), itertools.repeat(webp_effort)))
+
+    # converted images take the place of the originals, so the archive is written in the same order as the source
+    converted_paths = dict(zip(image_paths, kept_paths))
+    return [converted_paths.get(file) or file for file in files]
+
+'''
+    converts every image in a directory to png, the original images are deleted
+    files: the files of the directory from list_tree, the directory is listed when they aren't passed in
+
+    returns the files of the directory after the conversion, with converted images under their new path
+'''
+def traverse_directory_for_image_png_conversion(directory, compress, compress_rate, files=None):
+    if files is None:
+        files = list_tree(directory)
+
+    converted_files = []
+    for image_path in files:
+        if get_file_extension(image_path) in PNG_CONVERSION_EXTENSIONS:
+            converted_files.append(convert_image_to_png(image_path) or image_path)
+        else:
+            converted_files.append(image_path)
+    return converted_files
+
+'''
+    converts every image in a directory to jpg, the original images are deleted
+    files: the files of the directory from list_tree, the directory is listed when they aren't passed in
+
+    returns the files of the directory after the conversion, with converted images under their new path
+'''
+def traverse_directory_for_image_jpg_conversion(directory, compress, compress_rate, files=None):
+    if files is None:
+        files = list_tree(directory)
+
+    converted_files = []
+    for image_path in files:
+        if get_file_extension(image_path) in JPG_CONVERSION_EXTENSIONS:
+            converted_files.append(convert_image_to_jpg(image_path) or image_path)
+        else:
+            converted_files.append(image_path)
+    return converted_files
+
+def get_io_buffer():
+    buffer = getattr(io_buffers, 'buffer', None)
+    if buffer is None:
+        buffer = io_buffers.buffer = bytearray(1 << 20)
+    return buffer
+
+'''
+    picks the compression for an entry of a cbz file
+    images are stored, cbz readers expect that and deflating already compressed images only costs cpu
+    text metadata such as ComicInfo.xml compresses well, so it is deflated
+'''
+def get_zip_compress_type(name):
+    if get_file_extension(name) == '.xml':
+        return zipfile.ZIP_DEFLATED
+    return zipfile.ZIP_STORED
+
+'''
+    writes a file into an open zip file through the thread's reusable copy buffer
+    ZipFile.write allocates fresh read buffers for every file, this reads into the same one each time
+
+    zip_ref: the zip file opened for writing
+    file_path: the file to add
+    arcname: the name of the file inside the zip file
+'''
+def write_file_to_zip(zip_ref, file_path, arcname):
+    buffer = get_io_buffer()
+    view = memoryview(buffer)
+
+    zip_info = zipfile.ZipInfo.from_file(file_path, arcname)
+    zip_info.compress_type = get_zip_compress_type(arcname)
+
+    with open(file_path, 'rb', buffering=0) as source, zip_ref.open(zip_info, 'w') as destination:
+        while (size := source.readinto(buffer)):
+            destination.write(view[:size])
 
 '''
     compresses a directory into a cbz file
 
     directory: the directory to compress
     output: the directory to save the cbz file to
+    files: the files of the directory from list_tree, the directory is listed when they aren't passed in
 '''
-def compress_directory_to_comic_book_file_cbz(directory, output):
+def compress_directory_to_comic_book_file_cbz(directory, output, files=None):
     try:
-        with zipfile.ZipFile(output, 'w') as zip_ref:
-            for root, dirs, files in os.walk(directory):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    zip_ref.write(file_path, os.path.relpath(file_path, directory))
+        # images are already compressed, deflating them again costs cpu for no size gain
+        # the 1MB write buffer coalesces zipfile's small header and data writes
+        # every listed path starts with the directory, so the archive name is a slice rather than a relpath call
+        if files is None:
+            files = list_tree(directory)
+        directory_prefix_length = len(os.path.join(directory, ''))
+        with open(output, 'wb', buffering=1 << 20) as output_file:
+            with zipfile.ZipFile(output_file, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as zip_ref:
+                for file_path in files:
+                    write_file_to_zip(zip_ref, file_path, file_path[directory_prefix_length:])
+            release_page_cache(output_file)
         return True
     except Exception as e:
         print(f'Error: Failed to compress directory {directory}')
@@ -273,14 +777,16 @@ def compress_directory_to_comic_book_file_cbz(directory, output):
 
     directory: the directory to compress
     output: the directory to save the cbr file to
+    files: the files of the directory from list_tree, the directory is listed when they aren't passed in
 '''
-def compress_directory_to_comic_book_file_cbr(directory, output):
+def compress_directory_to_comic_book_file_cbr(directory, output, files=None):
     try:
+        if files is None:
+            files = list_tree(directory)
+        directory_prefix_length = len(os.path.join(directory, ''))
         with rarfile.RarFile(output, 'w') as rar_ref:
-            for root, dirs, files in os.walk(directory):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    rar_ref.write(file_path, os.path.relpath(file_path, directory))
+            for file_path in files:
+                rar_ref.write(file_path, file_path[directory_prefix_length:])
         return True
     except Exception as e:
         print(f'Error: Failed to compress directory {directory}')
@@ -323,23 +829,53 @@ def delete_directory(directory):
 '''
 def parse_directory_for_files(directory, recursive):
     files = []
-    for root, dirs, file_names in os.walk(directory):
-        for file in file_names:
-            if file[0] == '.':  # Skip hidden files
-                continue
-            files.append(os.path.join(root, file))
-        if not recursive:
-            break
+    directories = [directory]
+    while directories:
+        # scandir entries carry the file type from the directory listing, so no extra stat call is made per entry
+        with os.scandir(directories.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if recursive:
+                        directories.append(entry.path)
+                elif entry.name[0] != '.' and entry.is_file():  # Skip hidden files
+                    files.append(entry.path)
     return files
 
 '''
-    walks through a directory and creates a copy of the directory structure in the directory passed in
+    lists every file under a directory in a single scandir pass, hidden files included
+    the list is reused by the conversion and compression steps, so the tree is only walked once per comic
+
+    root: the directory to list
+
+    returns the paths of all the files in the directory and its subdirectories
+'''
+def list_tree(root):
+    files = []
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                files.extend(list_tree(entry.path))
+            elif entry.is_file():
+                files.append(entry.path)
+    return files
+
 '''
-def copy_directory_structure(directory, output):
+    creates a copy of the directory structure holding the files passed in, in the output directory
+    files: the files whose parent directories are copied, the whole directory tree is copied when they aren't passed in
+'''
+def copy_directory_structure(directory, output, files=None):
+    directory_prefix_length = len(os.path.join(directory, ''))
+    if files is not None:
+        # only the directories that hold a file are needed, they come straight from the file paths
+        directories = {os.path.dirname(file[directory_prefix_length:]) for file in files}
+        for relative_path in directories:
+            os.makedirs(os.path.join(output, relative_path), exist_ok=True)
+        return
+
     for root, dirs, files in os.walk(directory):
         for dir in dirs:
             dir_path = os.path.join(root, dir)
-            relative_path = os.path.relpath(dir_path, directory)
+            relative_path = dir_path[directory_prefix_length:]
             output_dir = os.path.join(output, relative_path)
             os.makedirs(output_dir, exist_ok=True)
     
@@ -351,45 +887,168 @@ def output_directory_contents(directory):
         print('')
 
 
+def print_pillow_build():
+    if PILLOW_SIMD:
+        print(f'Using Pillow-SIMD {PIL.__version__}')
+    else:
+        print(f'Using Pillow {PIL.__version__} (install pillow-simd for faster image conversion)')
+
+    if features.check_feature('libjpeg_turbo'):
+        print('JPEG codec: libjpeg-turbo')
+    else:
+        print('JPEG codec: libjpeg (rebuild Pillow against libjpeg-turbo for faster jpeg decoding)')
+
+
 def get_file_name_from_path(path):
     filename = os.path.basename(path)
     filename_without_extension = os.path.splitext(filename)[0]
     return filename_without_extension
 
-def convert_comic_book(input, output, convert_extension, convert_image_file_type, compress, compress_rate, comicinfo, input_directory=None):
-    temp_work_dir = create_temp_directory(output)
+'''
+    copies a ZipInfo for writing an entry into another zip file, keeping its name, dates and attributes
+    writing mutates the ZipInfo, so the source's copy is left untouched for reading
+'''
+def copy_zip_info(info):
+    destination_info = zipfile.ZipInfo(info.filename, info.date_time)
+    destination_info.compress_type = get_zip_compress_type(info.filename)
+    destination_info.external_attr = info.external_attr
+    destination_info.create_system = info.create_system
+    destination_info.comment = info.comment
+    return destination_info
 
-    file_compression_type = determine_compression_type(input)
+'''
+    builds the ZipInfo of a cbz entry from the name and modification time of an entry of another archive type
+    zip can't store times before 1980, those and missing times are written as the start of 1980
+'''
+def create_zip_info(name, date_time=None):
+    date_time = tuple(date_time or ())[:6]
+    destination_info = zipfile.ZipInfo(name, date_time if len(date_time) == 6 and date_time[0] >= 1980 else (1980, 1, 1, 0, 0, 0))
+    destination_info.compress_type = get_zip_compress_type(name)
+    return destination_info
+
+'''
+    writes the (ZipInfo, data) items of a queue into a zip file until WRITER_SENTINEL is received
+    runs on its own thread so writing the output overlaps with reading and converting the next entries
+
+    destination: the zip file opened for writing
+    write_queue: the queue the entries arrive on
+    errors: list the first write error is appended to, the queue keeps being drained afterwards so the producer never blocks
+'''
+def write_zip_entries(destination, write_queue, errors):
+    while (item := write_queue.get()) is not WRITER_SENTINEL:
+        if errors:
+            continue
+        try:
+            destination.writestr(*item)
+        except Exception as e:
+            errors.append(e)
+
+'''
+    converts one image entry of a comic book archive, run in the worker processes of convert_archive_streaming
+    name: the name of the entry
+    data: the bytes of the entry
+    convert_image_file_type: the image type to convert to, webp, png or jpg
+
+    returns the new entry name and bytes, or None if the original image should be kept
+    because the conversion failed or, for webp, wasn't smaller
+'''
+def convert_zip_entry(name, data, convert_image_file_type, compress_quality=100, fast_resize=False, webp_effort=4):
+    name_without_extension = os.path.splitext(name)[0]
 
-    if file_compression_type == 'ZIP':
-        decompress_zip_file(input, temp_work_dir)
-    elif file_compression_type == 'RAR':
-        status = decompress_rar_file(input, temp_work_dir)
-    elif file_compression_type == '7Z':
-        decompress_7z_file(input, temp_work_dir)
-    else:
-        print('Error: Unsupported compression type')
-        return False
-    
-    #print(compress)
-    #print(compressRate)
-    #print(comicinfo)
-    
     if convert_image_file_type == 'webp':
-        #print('Converting images to webp')
-        traverse_directory_for_image_webp_conversion(temp_work_dir, compress, compress_rate)
-    elif convert_image_file_type == 'png':
-        traverse_directory_for_image_png_conversion(temp_work_dir, compress, compress_rate)
-    elif convert_image_file_type == 'jpg':
-        traverse_directory_for_image_jpg_conversion(temp_work_dir, compress, compress_rate)
-    elif convert_image_file_type == 'original':
-        pass
-    else:
-        print('Error: Unsupported image conversion type')
-        return False
+        webp_data = convert_image_data_to_webp(data, name, compress_quality, fast_resize, webp_effort)
+        # keep the original image if the webp file is not smaller
+        if webp_data is not None and len(webp_data) < len(data):
+            return name_without_extension + '.webp', webp_data
+        return None
+
+    try:
+        with decode_image_bytes(data, name) as image:
+            if convert_image_file_type == 'png':
+                return name_without_extension + '.png', encode_image_as_png(image)
+            return name_without_extension + '.jpeg', encode_image_as_jpg(image)
+    except Exception as e:
+        print(f'Error: Failed to convert {convert_image_file_type} image {name}')
+        print(e)
+        return None
+
+'''
+    converts the images of a comic book archive and writes them straight into a new cbz file
+    entries are read, converted and written in a single pass in memory, so nothing is extracted to disk
+    images are converted in a process pool, while a single writer thread of the main process writes the output zip
+
+    archive: the ComicArchive to convert, its can_stream has to be True
+    output: the path of the cbz file to write
+    convert_image_file_type: the image type to convert to (webp, png or jpg), or original to copy every entry across as is
+    compress_quality: the webp quality used for the converted images
+    fast_resize: halve oversized images by nearest neighbour decimation instead of filtering
+    parallel: set to False when the caller is already running one comic per process, to avoid oversubscribing the cpu
+    webp_effort: the libwebp method used for the converted images, from 0 (fastest) to 6 (smallest files)
+
+    returns True if the file was successfully converted, False otherwise
+'''
+def convert_archive_streaming(archive, output, convert_image_file_type='webp', compress_quality=100, fast_resize=False, parallel=True, webp_effort=4):
+    max_workers = os.cpu_count() or 4
+    batch_size = max_workers * 4
+    use_pool = parallel and convert_image_file_type != 'original'
+
+    # the cbz is written to a hidden temp file next to it and only moved into place once it is complete,
+    # so converting a comic onto itself doesn't truncate the source while it is being read, and failures leave nothing behind
+    temp_path = None
 
-    output_file_path = None
+    try:
+        temp_fd, temp_path = tempfile.mkstemp(prefix='.', suffix='.tmp', dir=os.path.dirname(output) or os.path.curdir)
+        with os.fdopen(temp_fd, 'wb', buffering=1 << 20) as output_file:
+            with zipfile.ZipFile(output_file, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as destination, (ProcessPoolExecutor(max_workers=max_workers) if use_pool else contextlib.nullcontext()) as executor:
+                map_function = executor.map if executor is not None else map
+                entries = archive.iter_entry_data()
+
+                # a single writer thread owns the output zip, the bounded queue caps the memory held by finished entries
+                write_queue = queue.Queue(maxsize=max_workers * 2)
+                write_errors = []
+                writer = threading.Thread(target=write_zip_entries, args=(destination, write_queue, write_errors))
+                writer.start()
+
+                try:
+                    # entries are read a batch at a time to bound the memory held by pending images
+                    while (batch := list(itertools.islice(entries, batch_size))):
+                        convert_entries = [check_if_file_needs_conversion(info.filename, convert_image_file_type) for info, data in batch]
+                        image_entries = [entry for entry, convert_entry in zip(batch, convert_entries) if convert_entry]
+
+                        # map returns results in submission order, so the output keeps the order of the source
+                        conversion_results = map_function(convert_zip_entry, [info.filename for info, data in image_entries], [data for info, data in image_entries], itertools.repeat(convert_image_file_type), itertools.repeat(compress_quality), itertools.repeat(fast_resize), itertools.repeat(webp_effort))
+
+                        for (info, data), convert_entry in zip(batch, convert_entries):
+                            conversion_result = next(conversion_results) if convert_entry else None
+                            if conversion_result is not None:
+                                converted_name, converted_data = conversion_result
+                                write_queue.put((zipfile.ZipInfo(converted_name, info.date_time), converted_data))
+                            else:
+                                write_queue.put((info, data))
+                finally:
+                    write_queue.put(WRITER_SENTINEL)
+                    writer.join()
+
+                if write_errors:
+                    raise write_errors[0]
+            release_page_cache(output_file)
+
+        # mkstemp creates the file readable by its owner only, the cbz gets the permissions of the comic it came from
+        shutil.copymode(archive.file.name, temp_path)
+        os.replace(temp_path, output)
+        return True
+    except Exception as e:
+        print(f'Error: Failed to convert {archive.compression_type} file {archive.file.name}')
+        print(e)
+        return False
+    finally:
+        if temp_path is not None and os.path.exists(temp_path):
+            os.remove(temp_path)
 
+'''
+    builds the path of the converted comic book file, mirroring the input directory structure when input_directory is set
+'''
+def get_output_file_path(input, output, convert_extension, input_directory=None):
     if input_directory is not None:
         # remove the input directory from the input file path
         input_directory = os.path.abspath(input_directory)
@@ -403,26 +1062,70 @@ def convert_comic_book(input, output, convert_extension, convert_image_file_type
         # create the output file path
 
         output_file_path = output + input_path + '/' + file_name + '.' + convert_extension
-        print('output ' + output_file_path)
     else:
         output_file_path = output + '/' + get_file_name_from_path(input) + '.' + convert_extension
 
+    return output_file_path
+
+def convert_comic_book(input, output, convert_extension, convert_image_file_type, compress, compress_rate, comicinfo, input_directory=None, parallel_inner=True, fast_resize=False, webp_effort=4):
+    output_file_path = get_output_file_path(input, output, convert_extension, input_directory)
 
     if output_file_path is None:
         print('Error: Output file path is not set')
         exit(1)
 
-    if(convert_extension == 'cbz'):
-        compress_directory_to_comic_book_file_cbz(temp_work_dir, output_file_path)
-    elif(convert_extension == 'cbr'):
-        compress_directory_to_comic_book_file_cbr(temp_work_dir, output_file_path)
-    elif(convert_extension == 'cb7'):
-        compress_directory_to_comic_book_file_cb7(temp_work_dir, output_file_path)
-    else:
-        print('Error: Unsupported conversion extension type')
+    archive = open_archive(input)
+    if archive is None:
+        print('Error: Unsupported compression type')
         return False
 
-    delete_directory(temp_work_dir)
+    with archive:
+        # conversions to cbz stream entries between the archives instead of going through a temp directory
+        if convert_extension == 'cbz' and convert_image_file_type in ('webp', 'png', 'jpg', 'original') and archive.can_stream():
+            status = convert_archive_streaming(archive, output_file_path, convert_image_file_type, compress_rate if compress else 100, fast_resize, parallel_inner, webp_effort)
+            release_page_cache(archive.file)
+            return status
+
+        temp_work_dir = create_temp_directory(output)
+        if not archive.extract_all(temp_work_dir):
+            delete_directory(temp_work_dir)
+            return False
+
+        # the extracted tree is listed once and the list is kept up to date through the conversion
+        files = list_tree(temp_work_dir)
+    
+        #print(compress)
+        #print(compressRate)
+        #print(comicinfo)
+    
+        if convert_image_file_type == 'webp':
+            #print('Converting images to webp')
+            files = traverse_directory_for_image_webp_conversion(temp_work_dir, compress, compress_rate, parallel_inner, fast_resize, webp_effort, files)
+        elif convert_image_file_type == 'png':
+            files = traverse_directory_for_image_png_conversion(temp_work_dir, compress, compress_rate, files)
+        elif convert_image_file_type == 'jpg':
+            files = traverse_directory_for_image_jpg_conversion(temp_work_dir, compress, compress_rate, files)
+        elif convert_image_file_type == 'original':
+            pass
+        else:
+            print('Error: Unsupported image conversion type')
+            delete_directory(temp_work_dir)
+            return False
+
+        if(convert_extension == 'cbz'):
+            status = compress_directory_to_comic_book_file_cbz(temp_work_dir, output_file_path, files)
+        elif(convert_extension == 'cbr'):
+            status = compress_directory_to_comic_book_file_cbr(temp_work_dir, output_file_path, files)
+        elif(convert_extension == 'cb7'):
+            status = compress_directory_to_comic_book_file_cb7(temp_work_dir, output_file_path)
+        else:
+            print('Error: Unsupported conversion extension type')
+            delete_directory(temp_work_dir)
+            return False
+
+        release_page_cache(archive.file)
+        delete_directory(temp_work_dir)
+        return status
 
 
 if __name__ == '__main__':
@@ -440,10 +1143,11 @@ if __name__ == '__main__':
         print('Error: Output directory does not exist')
         exit(1)
 
+    print_pillow_build()
 
     if input_type == 'file':
         if(check_if_file_is_comic_book_file(args.input)):
-            convert_comic_book(args.input, args.output, args.convert_extension, args.convert_image_file_type, args.compress, args.compress_rate, args.comicinfo)
+            convert_comic_book(args.input, args.output, args.convert_extension, args.convert_image_file_type, args.compress, args.compress_rate, args.comicinfo, fast_resize=args.fast_resize, webp_effort=args.webp_effort)
         else:
             print('Error: Input file is not a comic book file')
 
@@ -451,11 +1155,16 @@ if __name__ == '__main__':
     if input_type == 'directory':
         files = parse_directory_for_files(args.input, args.recursive)
 
-        copy_directory_structure(args.input, args.output)
+        comic_files = [file for file in files if check_if_file_is_comic_book_file(file)]
+
+        copy_directory_structure(args.input, args.output, comic_files)
 
-        for file in files:
-            if(check_if_file_is_comic_book_file(file)):
-                print(f'Converting {file} - index {files.index(file) + 1} of {len(files)}')
-                convert_comic_book(file, args.output, args.convert_extension, args.convert_image_file_type, args.compress, args.compress_rate, args.comicinfo, args.input)
+        # convert one comic per process, each comic is independent so this scales with the number of cores
+        convert = functools.partial(convert_comic_book, output=args.output, convert_extension=args.convert_extension, convert_image_file_type=args.convert_image_file_type, compress=args.compress, compress_rate=args.compress_rate, comicinfo=args.comicinfo, input_directory=args.input, parallel_inner=False, fast_resize=args.fast_resize, webp_effort=args.webp_effort)
+        with ProcessPoolExecutor(max_workers=args.jobs or os.cpu_count()) as pool:
+            for index, (file, result) in enumerate(zip(comic_files, pool.map(convert, comic_files)), 1):
+                # terminal output is slow when redirected, so progress is only reported every few comics
+                if index % PROGRESS_INTERVAL == 0 or index == len(comic_files):
+                    print(f'Converted {file} - index {index} of {len(comic_files)}')
     
     #print(f'Time taken: {time.time() - startTime}')
@@ -1,8 +1,17 @@
+import mmap
 import os
+import shutil
 import sys
+import tempfile
 import zipfile
 import xml.etree.ElementTree as ET
 
+# A read only memory map ZipFile can read from, ZipFile asks its file whether it is seekable
+# and mmap only answers that itself from python 3.13 on
+class ArchiveMap(mmap.mmap):
+    def seekable(self):
+        return True
+
 def list_files_in_folder(folder_path, year):
     # Check if the given path is a directory
     if not os.path.isdir(folder_path):
@@ -29,39 +38,38 @@ def process_cbz_file(file_path, year):
         print(f"File '{file_path}' is not a valid zip file.")
         return
 
-    # Uncompress the file to a temporary directory
-    temp_dir = os.path.join(os.path.dirname(file_path), "temp_unzip")
-    os.makedirs(temp_dir, exist_ok=True)
-    
-    with zipfile.ZipFile(file_path, 'r') as zip_ref:
-        zip_ref.extractall(temp_dir)
+    # Copy every entry into a new archive next to the original, only 'ComicInfo.xml' is rewritten
+    # so the images are never extracted to disk, the hidden .tmp name keeps a leftover from an
+    # interrupted run out of the next scan
+    temp_fd, temp_path = tempfile.mkstemp(prefix='.', suffix='.cbz.tmp', dir=os.path.dirname(file_path))
+    os.close(temp_fd)
+
+    try:
+        # The original is mapped into memory so entries are read without copying them through a file buffer
+        with open(file_path, 'rb') as in_file, ArchiveMap(in_file.fileno(), 0, access=mmap.ACCESS_READ) as in_map, zipfile.ZipFile(in_map, 'r') as in_zip, zipfile.ZipFile(temp_path, 'w', zipfile.ZIP_STORED) as out_zip:
+            for info in in_zip.infolist():
+                data = in_zip.read(info)
 
-    # Check if 'ComicInfo.xml' exists in the uncompressed files
-    comic_info_path = os.path.join(temp_dir, 'ComicInfo.xml')
-    if os.path.isfile(comic_info_path):
-        print(f"'ComicInfo.xml' found in '{file_path}'")
-        # Modify the 'volume' property in 'ComicInfo.xml'
-        modify_comic_info(comic_info_path, year)
+                if info.filename == 'ComicInfo.xml':
+                    print(f"'ComicInfo.xml' found in '{file_path}'")
+                    # Modify the 'volume' property in 'ComicInfo.xml'
+                    data = modify_comic_info(data, year)
+                    info.compress_type = zipfile.ZIP_DEFLATED
+                else:
+                    # Images are already compressed, store them as is
+                    info.compress_type = zipfile.ZIP_STORED
 
-    # Recompress the folder into the same original file name
-    with zipfile.ZipFile(file_path, 'w') as zip_ref:
-        for folder_name, subfolders, filenames in os.walk(temp_dir):
-            for filename in filenames:
-                file_path_in_zip = os.path.join(folder_name, filename)
-                arcname = os.path.relpath(file_path_in_zip, temp_dir)
-                zip_ref.write(file_path_in_zip, arcname)
+                out_zip.writestr(info, data)
 
-    # Clean up the temporary directory
-    for root, dirs, files in os.walk(temp_dir, topdown=False):
-        for name in files:
-            os.remove(os.path.join(root, name))
-        for name in dirs:
-            os.rmdir(os.path.join(root, name))
-    os.rmdir(temp_dir)
+        # Replace the original file with the rewritten one, keeping its permissions
+        shutil.copymode(file_path, temp_path)
+        os.replace(temp_path, file_path)
+    except Exception:
+        os.remove(temp_path)
+        raise
 
-def modify_comic_info(file_path, year):
-    tree = ET.parse(file_path)
-    root = tree.getroot()
+def modify_comic_info(xml_data, year):
+    root = ET.fromstring(xml_data)
 
     # Find the 'volume' element and set its text to the year
     volume_element = root.find('Volume')
@@ -71,8 +79,8 @@ def modify_comic_info(file_path, year):
     
     volume_element.text = str(year)
 
-    # Save the modified XML back to the file
-    tree.write(file_path)
+    # Return the modified XML to be written back into the archive
+    return ET.tostring(root)
 
 if __name__ == "__main__":
     if len(sys.argv) != 3: